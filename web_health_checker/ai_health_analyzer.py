@@ -1,64 +1,142 @@
 import openai
+import httpx
+import asyncio
+import contextlib
+import importlib.util
 import json
 import os
-import time
+import atexit
+import threading
+
+from response_cache import make_cache_key, get_cached_response, store_response
+from retry_backoff import compute_retry_delay
+from openai_batch import run_chat_completions_batch
+from report_issues import count_report_issues, HEALTHY_REPORT_ANALYSIS
+from prompt_json import dumps_for_prompt, dumps_issue_list_for_prompt
 
 # --- Configuration ---
 # Ensure your OPENAI_API_KEY is set as an environment variable
 # openai.api_key = os.getenv("OPENAI_API_KEY") # For older openai library versions
-# For openai v1.0.0+ client is initialized like this:
+# For openai v1.0.0+ client is initialized like this (used for the Batch API file/batch endpoints):
 client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 MODEL_NAME = "gpt-3.5-turbo" # Or "gpt-4" if you have access and prefer higher quality (and cost)
 MAX_RETRIES = 3
-RETRY_DELAY = 5 # seconds
+RETRY_DELAY = 5 # seconds, base delay for exponential backoff
+PROMPT_VERSION = "summary-v1" # Cache namespace for this analyzer's prompt; bump when the prompt changes
+BATCH_PROMPT_VERSION = "batch-v1" # Cache namespace for analyses produced by the batched prompt
+BATCH_MAX_INPUT_TOKENS = 6000 # Approximate input budget per batched request
+BATCH_MAX_REPORTS = 5 # Keeps the combined answer well within the output token limit
+BATCH_MAX_OUTPUT_TOKENS = 3500
+# Same environment variables the openai client reads, so the direct HTTP path targets the same API/account
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+CHAT_COMPLETIONS_URL = f"{OPENAI_BASE_URL.rstrip('/')}/chat/completions"
+HTTP_TIMEOUT = 30.0 # seconds
+ASYNC_MAX_CONNECTIONS = 64 # Raise httpx's default pool cap so many concurrent analyses don't queue
+ASYNC_MAX_KEEPALIVE_CONNECTIONS = 32
+USE_HTTP2 = importlib.util.find_spec('h2') is not None # httpx needs the optional h2 package for HTTP/2
 
-# --- AI Agent Function ---
+# Chat completions are POSTed directly with a preconfigured httpx client rather than through
+# the openai client, which adds per-call overhead.
 
-def analyze_health_report_with_ai(health_report_json_str):
+def create_async_http_client():
     """
-    Sends the website health report to an LLM for analysis and suggestions.
+    Creates the httpx.AsyncClient used for chat completions. The caller owns it and must close
+    it (e.g. with "async with") on the same event loop it was used on.
     """
-    if not client.api_key:
-        return "Error: OPENAI_API_KEY not found. Please set it as an environment variable."
+    headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"}
+    if os.getenv("OPENAI_ORG_ID"):
+        headers["OpenAI-Organization"] = os.getenv("OPENAI_ORG_ID")
+    if os.getenv("OPENAI_PROJECT_ID"):
+        headers["OpenAI-Project"] = os.getenv("OPENAI_PROJECT_ID")
+    return httpx.AsyncClient(
+        http2=USE_HTTP2,
+        timeout=HTTP_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=ASYNC_MAX_CONNECTIONS,
+            max_keepalive_connections=ASYNC_MAX_KEEPALIVE_CONNECTIONS
+        ),
+        headers=headers
+    )
 
-    try:
-        health_data = json.loads(health_report_json_str)
-    except json.JSONDecodeError:
-        return "Error: Invalid JSON input for health report."
+@contextlib.asynccontextmanager
+async def _http_client_scope(http_client=None):
+    """Yields http_client if one was passed in, otherwise a new client that is closed on exit."""
+    if http_client is not None:
+        yield http_client
+    else:
+        async with create_async_http_client() as owned_client:
+            yield owned_client
 
-    # Construct a detailed prompt
-    prompt_messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are a helpful AI QA Assistant. Your task is to analyze a website health check report, "
-                "summarize the findings, prioritize issues by potential impact (user experience, SEO, accessibility), "
-                "and suggest general best practices for fixing common types of issues found. "
-                "Be concise yet informative. Use markdown for formatting if appropriate (e.g., lists)."
-            )
-        },
-        {
-            "role": "user",
-            "content": f"""
-            Please analyze the following website health report:
+# The sync entry points run on one background event loop that keeps a single pooled client
+# alive, so successive sync calls reuse keep-alive connections instead of reconnecting.
+_SYNC_LOOP = None
+_SYNC_HTTP_CLIENT = None
+_SYNC_LOCK = threading.Lock()
+
+def _run_sync(coroutine_function, *args, **kwargs):
+    """Runs coroutine_function(*args, http_client=<shared client>, **kwargs) on the background loop and waits for it."""
+    global _SYNC_LOOP, _SYNC_HTTP_CLIENT
+    with _SYNC_LOCK:
+        if _SYNC_LOOP is None:
+            _SYNC_LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_SYNC_LOOP.run_forever, daemon=True).start()
+            _SYNC_HTTP_CLIENT = create_async_http_client()
+            atexit.register(_close_sync_client)
+    coroutine = coroutine_function(*args, http_client=_SYNC_HTTP_CLIENT, **kwargs)
+    return asyncio.run_coroutine_threadsafe(coroutine, _SYNC_LOOP).result()
 
+def _close_sync_client():
+    """Closes the shared sync-path client and stops the background event loop."""
+    global _SYNC_LOOP, _SYNC_HTTP_CLIENT
+    with _SYNC_LOCK:
+        if _SYNC_LOOP is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(_SYNC_HTTP_CLIENT.aclose(), _SYNC_LOOP).result(timeout=10)
+        except Exception as e:
+            print(f"Error closing HTTP client: {e}")
+        _SYNC_LOOP.call_soon_threadsafe(_SYNC_LOOP.stop)
+        _SYNC_LOOP, _SYNC_HTTP_CLIENT = None, None
+
+# --- Prompt Building ---
+
+SYSTEM_PROMPT = (
+    "You are a helpful AI QA Assistant. Your task is to analyze a website health check report, "
+    "summarize the findings, prioritize issues by potential impact (user experience, SEO, accessibility), "
+    "and suggest general best practices for fixing common types of issues found. "
+    "Be concise yet informative. Use markdown for formatting if appropriate (e.g., lists)."
+)
+
+def format_report_for_prompt(health_data):
+    """Formats a single parsed health report as plain text for the LLM prompt."""
+    return f"""
             URL Checked: {health_data.get('url_checked')}
             Final URL (after redirects): {health_data.get('final_url')}
             Page Fetch Status: {health_data.get('fetch_status')}
 
             Broken Internal Links Found ({len(health_data.get('broken_links', []))}):
-            {json.dumps(health_data.get('broken_links', []), indent=2) if health_data.get('broken_links') else "None"}
+            {dumps_issue_list_for_prompt(health_data.get('broken_links', [])) if health_data.get('broken_links') else "None"}
 
             Images Missing or with Empty Alt Text ({len(health_data.get('images_missing_alt', []))}):
-            {json.dumps(health_data.get('images_missing_alt', []), indent=2) if health_data.get('images_missing_alt') else "None"}
+            {dumps_issue_list_for_prompt(health_data.get('images_missing_alt', [])) if health_data.get('images_missing_alt') else "None"}
 
             H1 Tag Status:
-            {json.dumps(health_data.get('h1_status', {}), indent=2) if health_data.get('h1_status') else "Not checked"}
+            {dumps_for_prompt(health_data.get('h1_status', {})) if health_data.get('h1_status') else "Not checked"}
 
             Severe Console Errors Found ({len(health_data.get('console_errors', []))}):
-            {json.dumps(health_data.get('console_errors', []), indent=2) if health_data.get('console_errors') else "None"}
+            {dumps_issue_list_for_prompt(health_data.get('console_errors', [])) if health_data.get('console_errors') else "None"}
+"""
 
+def build_prompt_messages(health_data):
+    """Builds the chat messages asking the LLM to analyze a single health report."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"""
+            Please analyze the following website health report:
+            {format_report_for_prompt(health_data)}
             ---
             Based on this report, provide:
             1. A concise overall summary of the website's health.
@@ -69,40 +147,335 @@ def analyze_health_report_with_ai(health_report_json_str):
         }
     ]
 
-    print(f"\n--- Sending data to {MODEL_NAME} for analysis... ---")
+# --- AI Agent Functions ---
+
+def _build_request_body(prompt_messages, max_tokens, **request_options):
+    return {
+        "model": MODEL_NAME,
+        "messages": prompt_messages,
+        "temperature": 0.5, # Lower temperature for more factual, less creative output
+        "max_tokens": max_tokens, # Adjust as needed based on expected output length
+        **request_options
+    }
+
+async def _stream_completion(http_client, prompt_messages, max_tokens, on_token):
+    """Streams the response, passing each text delta to on_token as it arrives. Returns the full text."""
+    request_body = _build_request_body(prompt_messages, max_tokens, stream=True)
+    text_parts = []
+    async with http_client.stream("POST", CHAT_COMPLETIONS_URL, json=request_body) as response:
+        if response.is_error:
+            await response.aread() # Load the error body so it is available on the exception
+        response.raise_for_status()
+        # Server-sent events: one "data: {chunk json}" line per chunk, terminated by "data: [DONE]"
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get('choices')
+            if not choices:
+                continue
+            delta = choices[0].get('delta', {}).get('content') or ''
+            if delta:
+                text_parts.append(delta)
+                on_token(delta)
+    return ''.join(text_parts).strip()
+
+async def _create_completion_with_retry(http_client, prompt_messages, max_tokens=1000, on_token=None, **request_options):
+    """
+    Sends the chat messages to the LLM, retrying on errors.
+    If on_token is given, the response is streamed and each text delta is passed to it as it arrives.
+    A stream that fails after on_token has received text is not retried, since the caller
+    would see the output repeated.
+    Returns (response_text, None) on success or (None, error_message) on failure.
+    """
+    stream_state = {'tokens_emitted': False}
+    def on_token_tracked(delta):
+        stream_state['tokens_emitted'] = True
+        on_token(delta)
 
     for attempt in range(MAX_RETRIES):
         try:
-            response = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=prompt_messages,
-                temperature=0.5, # Lower temperature for more factual, less creative output
-                max_tokens=1000 # Adjust as needed based on expected output length
+            if on_token:
+                return await _stream_completion(http_client, prompt_messages, max_tokens, on_token_tracked), None
+
+            response = await http_client.post(
+                CHAT_COMPLETIONS_URL, json=_build_request_body(prompt_messages, max_tokens, **request_options)
             )
+            response.raise_for_status()
+            choices = response.json().get('choices')
             # Ensure the response structure is as expected
-            if response.choices and response.choices[0].message:
-                ai_summary = response.choices[0].message.content.strip()
-                return ai_summary
+            if choices and choices[0].get('message', {}).get('content'):
+                return choices[0]['message']['content'].strip(), None
             else:
                 print(f"Warning: Unexpected API response structure on attempt {attempt + 1}.")
                 # Log or handle unexpected structure, e.g. by returning an error or default message
                 if attempt == MAX_RETRIES - 1:
-                    return "Error: Received unexpected API response structure after multiple retries."
+                    return None, "Error: Received unexpected API response structure after multiple retries."
 
-        except openai.APIError as e: # Catch OpenAI specific errors
+        except (httpx.HTTPStatusError, httpx.RequestError) as e: # Catch API and network errors
             print(f"OpenAI API Error on attempt {attempt + 1}/{MAX_RETRIES}: {e}")
+            if stream_state['tokens_emitted']:
+                return None, f"Error: The streamed response was interrupted after partial output: {e}"
             if attempt == MAX_RETRIES - 1:
-                return f"Error: OpenAI API request failed after {MAX_RETRIES} retries: {e}"
-            print(f"Retrying in {RETRY_DELAY} seconds...")
-            time.sleep(RETRY_DELAY)
-        except Exception as e: # Catch other potential errors (network, etc.)
+                return None, f"Error: OpenAI API request failed after {MAX_RETRIES} retries: {e}"
+            delay = compute_retry_delay(attempt, RETRY_DELAY, e)
+            print(f"Retrying in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+        except Exception as e: # Catch other potential errors (unexpected payloads, etc.)
             print(f"An unexpected error occurred on attempt {attempt + 1}/{MAX_RETRIES}: {e}")
+            if stream_state['tokens_emitted']:
+                return None, f"Error: The streamed response was interrupted after partial output: {e}"
             if attempt == MAX_RETRIES - 1:
-                return f"Error: An unexpected error occurred after {MAX_RETRIES} retries: {e}"
-            print(f"Retrying in {RETRY_DELAY} seconds...")
-            time.sleep(RETRY_DELAY)
+                return None, f"Error: An unexpected error occurred after {MAX_RETRIES} retries: {e}"
+            delay = compute_retry_delay(attempt, RETRY_DELAY)
+            print(f"Retrying in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
 
-    return "Error: AI analysis failed after multiple retries."
+    return None, "Error: AI analysis failed after multiple retries."
+
+async def analyze_health_report_with_ai_async(health_report_json_str, on_token=None, http_client=None):
+    """
+    Sends the website health report to an LLM for analysis and suggestions.
+    Async so that analyses of several reports can be run concurrently with asyncio.gather.
+    If on_token is given, the analysis is streamed to it as it is generated (a cached
+    analysis is passed to it in one piece). The full analysis is returned either way.
+    Pass http_client to share one connection pool across calls, otherwise a client is
+    created and closed for this call.
+    """
+    if not client.api_key:
+        return "Error: OPENAI_API_KEY not found. Please set it as an environment variable."
+
+    try:
+        health_data = json.loads(health_report_json_str)
+    except json.JSONDecodeError:
+        return "Error: Invalid JSON input for health report."
+
+    if count_report_issues(health_data) == 0:
+        print("\n--- No issues found, skipping AI analysis ---")
+        if on_token:
+            on_token(HEALTHY_REPORT_ANALYSIS)
+        return HEALTHY_REPORT_ANALYSIS
+
+    cache_key = make_cache_key(health_data, MODEL_NAME, PROMPT_VERSION)
+    cached_summary = get_cached_response(cache_key)
+    if cached_summary is not None:
+        print("\n--- Using cached AI analysis for this report ---")
+        if on_token:
+            on_token(cached_summary)
+        return cached_summary
+
+    print(f"\n--- Sending data to {MODEL_NAME} for analysis... ---")
+    async with _http_client_scope(http_client) as http_client:
+        ai_summary, error_message = await _create_completion_with_retry(
+            http_client, build_prompt_messages(health_data), on_token=on_token
+        )
+    if error_message:
+        return error_message
+    store_response(cache_key, ai_summary)
+    return ai_summary
+
+def analyze_health_report_with_ai(health_report_json_str, on_token=None):
+    """
+    Synchronous wrapper around analyze_health_report_with_ai_async.
+    Successive calls share one pooled connection to the API.
+    """
+    return _run_sync(analyze_health_report_with_ai_async, health_report_json_str, on_token=on_token)
+
+# --- Batched Analysis (several reports per request) ---
+
+def _estimate_tokens(text):
+    """Rough token estimate (~4 characters per token for English text and JSON)."""
+    return len(text) // 4
+
+def _split_into_batches(reports):
+    """Splits (index, health_data, report_text) tuples into batches that fit the input token and size budgets."""
+    batches, current_batch, current_tokens = [], [], 0
+    for report in reports:
+        report_tokens = _estimate_tokens(report[2])
+        if current_batch and (current_tokens + report_tokens > BATCH_MAX_INPUT_TOKENS or len(current_batch) >= BATCH_MAX_REPORTS):
+            batches.append(current_batch)
+            current_batch, current_tokens = [], 0
+        current_batch.append(report)
+        current_tokens += report_tokens
+    if current_batch:
+        batches.append(current_batch)
+    return batches
+
+def _format_list_for_markdown(value):
+    if isinstance(value, list):
+        return "\n".join(f"- {item}" for item in value) if value else "- None"
+    return str(value)
+
+def _format_batch_analysis(analysis):
+    """Formats one entry of the batched JSON response as markdown, like a single-report analysis."""
+    return (
+        f"## Overall Summary\n{analysis.get('summary', '')}\n\n"
+        f"## Prioritized Issues\n{_format_list_for_markdown(analysis.get('prioritized_issues', []))}\n\n"
+        f"## Advice\n{_format_list_for_markdown(analysis.get('advice', []))}"
+    )
+
+def _parse_batch_analyses(response_text, batch_size):
+    """
+    Parses the batched JSON response into {report_number: analysis_dict}.
+    Raises ValueError unless there is exactly one object per report number 1..batch_size.
+    """
+    analyses = json.loads(response_text)
+    if not isinstance(analyses, dict) or not isinstance(analyses.get('analyses'), list):
+        raise ValueError("response is not an object with an 'analyses' list")
+    analyses_by_report = {}
+    for analysis in analyses['analyses']:
+        if not isinstance(analysis, dict):
+            raise ValueError(f"analysis entry is not an object: {analysis!r}")
+        try:
+            report_number = int(analysis.get('report'))
+        except (TypeError, ValueError):
+            raise ValueError(f"analysis entry has an invalid report number: {analysis.get('report')!r}")
+        if report_number in analyses_by_report:
+            raise ValueError(f"duplicate analysis for report {report_number}")
+        analyses_by_report[report_number] = analysis
+    if set(analyses_by_report) != set(range(1, batch_size + 1)):
+        raise ValueError(f"expected analyses for reports 1-{batch_size}, got {sorted(analyses_by_report)}")
+    return analyses_by_report
+
+async def _analyze_batch(http_client, batch):
+    """Analyzes a batch of reports in one request. Returns {index: analysis_text}."""
+    if len(batch) == 1:
+        index, health_data, _ = batch[0]
+        return {index: await analyze_health_report_with_ai_async(json.dumps(health_data), http_client=http_client)}
+
+    reports_text = "\n".join(
+        f"REPORT {report_number}:\n{report_text}" for report_number, (_, _, report_text) in enumerate(batch, start=1)
+    )
+    prompt_messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": (
+                f"Analyze each of these {len(batch)} website health reports separately.\n"
+                'Respond with a JSON object of the form {"analyses": [...]} containing one object per report, '
+                'in the same order, each with the keys "report", "url", "summary", "prioritized_issues" and "advice". '
+                '"report" is the report number, "prioritized_issues" and "advice" are lists of strings.\n\n'
+                f"{reports_text}"
+            )
+        }
+    ]
+
+    print(f"\n--- Sending {len(batch)} reports to {MODEL_NAME} in one request... ---")
+    response_text, error_message = await _create_completion_with_retry(
+        http_client,
+        prompt_messages,
+        max_tokens=BATCH_MAX_OUTPUT_TOKENS,
+        response_format={"type": "json_object"}
+    )
+    if error_message:
+        return {index: error_message for index, _, _ in batch}
+
+    try:
+        analyses_by_report = _parse_batch_analyses(response_text, len(batch))
+    except ValueError as e: # json.JSONDecodeError is a ValueError too
+        print(f"Warning: Could not parse batched response ({e}). Analyzing reports individually...")
+        results = await asyncio.gather(*[_analyze_batch(http_client, [report]) for report in batch])
+        return {index: analysis for result in results for index, analysis in result.items()}
+
+    results = {}
+    for report_number, (index, health_data, _) in enumerate(batch, start=1):
+        ai_summary = _format_batch_analysis(analyses_by_report[report_number])
+        store_response(make_cache_key(health_data, MODEL_NAME, BATCH_PROMPT_VERSION), ai_summary)
+        results[index] = ai_summary
+    return results
+
+def analyze_reports_batch_api(health_report_json_strs):
+    """
+    Analyzes the reports through the OpenAI Batch API, for scheduled/offline runs.
+    About half the cost of live requests, but blocks until the batch job completes (up to 24h).
+    Uses the same prompt as analyze_health_report_with_ai, so results share its cache.
+    """
+    if not client.api_key:
+        return ["Error: OPENAI_API_KEY not found. Please set it as an environment variable."] * len(health_report_json_strs)
+
+    results = [None] * len(health_report_json_strs)
+    pending = [] # (index, cache_key, prompt_messages)
+    for index, report_str in enumerate(health_report_json_strs):
+        try:
+            health_data = json.loads(report_str)
+        except json.JSONDecodeError:
+            results[index] = "Error: Invalid JSON input for health report."
+            continue
+        if count_report_issues(health_data) == 0:
+            results[index] = HEALTHY_REPORT_ANALYSIS
+            continue
+        cache_key = make_cache_key(health_data, MODEL_NAME, PROMPT_VERSION)
+        cached_summary = get_cached_response(cache_key)
+        if cached_summary is not None:
+            results[index] = cached_summary
+        else:
+            pending.append((index, cache_key, build_prompt_messages(health_data)))
+
+    if pending:
+        batch_results = run_chat_completions_batch(
+            client, [prompt_messages for _, _, prompt_messages in pending], MODEL_NAME, temperature=0.5, max_tokens=1000
+        )
+        for (index, cache_key, _), (ai_summary, error_message) in zip(pending, batch_results):
+            if error_message:
+                results[index] = error_message
+            else:
+                store_response(cache_key, ai_summary)
+                results[index] = ai_summary
+    return results
+
+async def analyze_health_reports_batch_async(health_report_json_strs, http_client=None):
+    """
+    Analyzes several health reports, packing multiple reports into each request so the
+    system prompt is sent once per batch. Returns the analyses in input order.
+    Pass http_client to reuse a connection pool, otherwise one is created for this run.
+    """
+    if len(health_report_json_strs) <= 1:
+        return [
+            await analyze_health_report_with_ai_async(report_str, http_client=http_client)
+            for report_str in health_report_json_strs
+        ]
+    if not client.api_key:
+        return ["Error: OPENAI_API_KEY not found. Please set it as an environment variable."] * len(health_report_json_strs)
+
+    results = [None] * len(health_report_json_strs)
+    reports_to_analyze = []
+    for index, report_str in enumerate(health_report_json_strs):
+        try:
+            health_data = json.loads(report_str)
+        except json.JSONDecodeError:
+            results[index] = "Error: Invalid JSON input for health report."
+            continue
+        if count_report_issues(health_data) == 0:
+            results[index] = HEALTHY_REPORT_ANALYSIS
+            continue
+        # Reports that went down the single-report route (batch of one, fallback) are cached under PROMPT_VERSION
+        cached_summary = get_cached_response(make_cache_key(health_data, MODEL_NAME, BATCH_PROMPT_VERSION))
+        if cached_summary is None:
+            cached_summary = get_cached_response(make_cache_key(health_data, MODEL_NAME, PROMPT_VERSION))
+        if cached_summary is not None:
+            results[index] = cached_summary
+        else:
+            reports_to_analyze.append((index, health_data, format_report_for_prompt(health_data)))
+
+    async with _http_client_scope(http_client) as http_client:
+        batch_results = await asyncio.gather(
+            *[_analyze_batch(http_client, batch) for batch in _split_into_batches(reports_to_analyze)]
+        )
+    for batch_result in batch_results:
+        for index, analysis in batch_result.items():
+            results[index] = analysis
+    return results
+
+def analyze_health_reports_batch(health_report_json_strs, batch_mode=False):
+    """
+    Synchronous wrapper around analyze_health_reports_batch_async.
+    With batch_mode=True the reports are sent through the (slower, cheaper) OpenAI Batch API instead.
+    """
+    if batch_mode:
+        return analyze_reports_batch_api(health_report_json_strs)
+    return _run_sync(analyze_health_reports_batch_async, health_report_json_strs)
 
 
 # --- Main execution (for testing this script directly) ---
@@ -164,12 +537,20 @@ if __name__ == "__main__":
     }
     """
 
-    print("--- Analyzing Report with Issues ---")
-    ai_analysis = analyze_health_report_with_ai(example_health_report_str)
+    print("--- Analyzing Report with Issues (streamed) ---")
     print("\n--- AI Analysis Result ---")
-    print(ai_analysis)
+    ai_analysis = analyze_health_report_with_ai(example_health_report_str, on_token=lambda text: print(text, end='', flush=True))
+    print()
+    if ai_analysis.startswith("Error"): # Errors are returned, not streamed
+        print(ai_analysis)
 
     print("\n\n--- Analyzing Report with No Issues ---")
     ai_analysis_no_issues = analyze_health_report_with_ai(example_no_issues_report_str)
     print("\n--- AI Analysis Result (No Issues) ---")
-    print(ai_analysis_no_issues)
\ No newline at end of file
+    print(ai_analysis_no_issues)
+
+    print("\n\n--- Analyzing Both Reports in One Batched Request ---")
+    batch_analyses = analyze_health_reports_batch([example_health_report_str, example_no_issues_report_str])
+    for batch_analysis in batch_analyses:
+        print("\n--- AI Analysis Result (Batched) ---")
+        print(batch_analysis)
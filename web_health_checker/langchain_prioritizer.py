@@ -5,13 +5,19 @@ import time
 # LangChain imports
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, SystemMessagePromptTemplate
-from langchain.chains import LLMChain
 import openai # Keep for APIError if needed for specific error handling
 
+from response_cache import make_cache_key, get_cached_response, store_response
+from retry_backoff import compute_retry_delay
+from openai_batch import run_chat_completions_batch
+from report_issues import count_report_issues, HEALTHY_REPORT_ANALYSIS
+from prompt_json import dumps_for_prompt, dumps_issue_list_for_prompt
+
 # --- Configuration ---
 MODEL_NAME = "gpt-3.5-turbo-0125"  # Or your preferred OpenAI model
 MAX_RETRIES = 3
-RETRY_DELAY_SECONDS = 5
+RETRY_DELAY_SECONDS = 5 # Base delay for exponential backoff
+PROMPT_VERSION = "cot-v1" # Cache namespace for the CoT prompt templates; bump when they change
 
 # --- 1. LLM and Prompt Setup ---
 
@@ -60,14 +66,6 @@ Please perform the Chain-of-Thought analysis and prioritization as instructed.
     human_message_prompt = HumanMessagePromptTemplate.from_template(human_template_str)
     return ChatPromptTemplate.from_messages([system_message_prompt, human_message_prompt])
 
-def create_prioritization_llm_chain(llm, prompt_template):
-    """Creates and returns an LLMChain for the prioritization task."""
-    return LLMChain(
-        llm=llm,
-        prompt=prompt_template,
-        verbose=False  # Set to True for debugging LangChain's internal steps
-    )
-
 # --- 2. Data Preparation ---
 
 def format_report_details_for_prompt(health_data_dict):
@@ -76,21 +74,21 @@ def format_report_details_for_prompt(health_data_dict):
     if health_data_dict.get('broken_links'):
         details_parts.append(
             f"Broken Internal Links ({len(health_data_dict['broken_links'])}):\n"
-            f"{json.dumps(health_data_dict['broken_links'], indent=2)}"
+            f"{dumps_issue_list_for_prompt(health_data_dict['broken_links'])}"
         )
     if health_data_dict.get('images_missing_alt'):
         details_parts.append(
             f"Images Missing/Empty Alt Text ({len(health_data_dict['images_missing_alt'])}):\n"
-            f"{json.dumps(health_data_dict['images_missing_alt'], indent=2)}"
+            f"{dumps_issue_list_for_prompt(health_data_dict['images_missing_alt'])}"
         )
     if health_data_dict.get('h1_status'):
         details_parts.append(
-            f"H1 Tag Status:\n{json.dumps(health_data_dict['h1_status'], indent=2)}"
+            f"H1 Tag Status:\n{dumps_for_prompt(health_data_dict['h1_status'])}"
         )
     if health_data_dict.get('console_errors'):
         details_parts.append(
             f"Severe Console Errors ({len(health_data_dict['console_errors'])}):\n"
-            f"{json.dumps(health_data_dict['console_errors'], indent=2)}"
+            f"{dumps_issue_list_for_prompt(health_data_dict['console_errors'])}"
         )
 
     if not details_parts:
@@ -98,7 +96,7 @@ def format_report_details_for_prompt(health_data_dict):
     return "\n\n".join(details_parts)
 
 def prepare_input_for_chain(health_data_dict):
-    """Prepares the input dictionary for the LLMChain based on the health report."""
+    """Prepares the prompt template input dictionary based on the health report."""
     report_details_string = format_report_details_for_prompt(health_data_dict)
     return {
         "url_checked": health_data_dict.get('url_checked', 'N/A'),
@@ -109,21 +107,23 @@ def prepare_input_for_chain(health_data_dict):
 
 # --- 3. Execution and Error Handling ---
 
-def invoke_llm_chain_with_retry(chain, input_data, max_retries=MAX_RETRIES, delay_seconds=RETRY_DELAY_SECONDS):
-    """Invokes the LLMChain with retry logic for API errors."""
+def invoke_llm_chain_with_retry(chain, input_data, max_retries=MAX_RETRIES, delay_seconds=RETRY_DELAY_SECONDS, cache_key=None):
+    """Invokes the prompt | llm chain with retry logic for API errors. Successful responses are cached under cache_key, if given."""
     last_exception = None
     for attempt in range(max_retries):
         try:
-            print(f"\n--- Attempt {attempt + 1}/{max_retries}: Sending data to {chain.llm.model_name} via LangChain for CoT analysis... ---")
-            response_dict = chain.invoke(input_data)
-            # LLMChain typically returns output in a 'text' key
-            ai_analysis_text = response_dict.get('text')
+            print(f"\n--- Attempt {attempt + 1}/{max_retries}: Sending data to {chain.last.model_name} via LangChain for CoT analysis... ---")
+            response_message = chain.invoke(input_data)
+            # The chat model returns an AIMessage, its text is in .content
+            ai_analysis_text = response_message.content
             if ai_analysis_text:
+                if cache_key:
+                    store_response(cache_key, ai_analysis_text)
                 return ai_analysis_text
             else:
                 # This case should be rare if the LLM responds, but good to have
-                last_exception = ValueError("LLM response did not contain 'text' output.")
-                print(f"Warning: {last_exception} Response: {response_dict}")
+                last_exception = ValueError("LLM response did not contain any content.")
+                print(f"Warning: {last_exception} Response: {response_message}")
 
         except openai.APIError as e: # More specific OpenAI error handling
             last_exception = e
@@ -136,8 +136,9 @@ def invoke_llm_chain_with_retry(chain, input_data, max_retries=MAX_RETRIES, dela
             print(f"An unexpected error occurred on attempt {attempt + 1}: {e}")
 
         if attempt < max_retries - 1:
-            print(f"Retrying in {delay_seconds} seconds...")
-            time.sleep(delay_seconds)
+            delay = compute_retry_delay(attempt, delay_seconds, last_exception)
+            print(f"Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
 
     return f"Error: LangChain analysis failed after {max_retries} retries. Last error: {last_exception}"
 
@@ -146,7 +147,7 @@ def invoke_llm_chain_with_retry(chain, input_data, max_retries=MAX_RETRIES, dela
 def analyze_with_langchain_cot(health_report_json_str):
     """
     Orchestrates the Chain-of-Thought analysis using LangChain.
-    1. Parses input JSON.
+    1. Parses input JSON. Returns early for reports without issues or previously analyzed reports.
     2. Initializes LLM and Chain.
     3. Prepares input data for the chain.
     4. Invokes the chain with retry logic.
@@ -156,20 +157,79 @@ def analyze_with_langchain_cot(health_report_json_str):
     except json.JSONDecodeError as e:
         return f"Error: Invalid JSON input for health report. Details: {e}"
 
+    if count_report_issues(health_data_dict) == 0:
+        print("\n--- No issues found, skipping LangChain CoT analysis ---")
+        return HEALTHY_REPORT_ANALYSIS
+
+    cache_key = make_cache_key(health_data_dict, MODEL_NAME, PROMPT_VERSION)
+    cached_analysis = get_cached_response(cache_key)
+    if cached_analysis is not None:
+        print("\n--- Using cached LangChain CoT analysis for this report ---")
+        return cached_analysis
+
     try:
         llm = get_llm_instance()
         prompt_template = get_prioritization_prompt_template()
-        prioritization_chain = create_prioritization_llm_chain(llm, prompt_template)
+        prioritization_chain = prompt_template | llm
         chain_input_data = prepare_input_for_chain(health_data_dict)
     except ValueError as e: # Catches API key not set error from get_llm_instance
         return str(e)
     except Exception as e: # Catch other setup errors
         return f"Error during LangChain setup: {e}"
 
-    return invoke_llm_chain_with_retry(prioritization_chain, chain_input_data)
+    return invoke_llm_chain_with_retry(prioritization_chain, chain_input_data, cache_key=cache_key)
+
+
+# --- 5. Offline Batch Analysis ---
+
+LANGCHAIN_TO_OPENAI_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+def analyze_with_langchain_cot_batch_api(health_report_json_strs, temperature=0.3):
+    """
+    Runs the same CoT analysis for many reports through the OpenAI Batch API, for
+    scheduled/offline runs. About half the cost of live requests, but blocks until the
+    batch job completes (up to 24h). Returns the analyses in input order.
+    """
+    if not os.getenv("OPENAI_API_KEY"):
+        return ["OPENAI_API_KEY environment variable not set."] * len(health_report_json_strs)
+
+    prompt_template = get_prioritization_prompt_template()
+    results = [None] * len(health_report_json_strs)
+    pending = [] # (index, cache_key, prompt_messages)
+    for index, report_str in enumerate(health_report_json_strs):
+        try:
+            health_data_dict = json.loads(report_str)
+        except json.JSONDecodeError as e:
+            results[index] = f"Error: Invalid JSON input for health report. Details: {e}"
+            continue
+        if count_report_issues(health_data_dict) == 0:
+            results[index] = HEALTHY_REPORT_ANALYSIS
+            continue
+        cache_key = make_cache_key(health_data_dict, MODEL_NAME, PROMPT_VERSION)
+        cached_analysis = get_cached_response(cache_key)
+        if cached_analysis is not None:
+            results[index] = cached_analysis
+            continue
+        messages = prompt_template.format_messages(**prepare_input_for_chain(health_data_dict))
+        pending.append((index, cache_key, [
+            {"role": LANGCHAIN_TO_OPENAI_ROLES[message.type], "content": message.content} for message in messages
+        ]))
+
+    if pending:
+        batch_results = run_chat_completions_batch(
+            openai.OpenAI(), [prompt_messages for _, _, prompt_messages in pending], MODEL_NAME,
+            temperature=temperature
+        )
+        for (index, cache_key, _), (ai_analysis_text, error_message) in zip(pending, batch_results):
+            if error_message:
+                results[index] = error_message
+            else:
+                store_response(cache_key, ai_analysis_text)
+                results[index] = ai_analysis_text
+    return results
 
 
-# --- 5. Test Execution Block ---
+# --- 6. Test Execution Block ---
 if __name__ == "__main__":
     # Example health report with some issues
     example_health_report_with_issues_str = """
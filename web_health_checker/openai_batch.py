@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import time
+
+# --- Configuration ---
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_INTERVAL = 60 # seconds between status checks
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+def _extract_content(body):
+    """Returns (content, None) for a successful completion body, or (None, error_message) if it has no text (e.g. a refusal)."""
+    choices = body.get('choices') or []
+    message = (choices[0].get('message') or {}) if choices else {}
+    content = (message.get('content') or '').strip()
+    if content:
+        return content, None
+    reason = message.get('refusal') or (choices[0].get('finish_reason') if choices else None) or 'no choices returned'
+    return None, f"Error: Batch request returned no content ({reason})."
+
+def run_chat_completions_batch(client, prompt_messages_list, model_name, temperature, max_tokens=None):
+    """
+    Runs chat completions through the OpenAI Batch API (cheaper, no per-request rate limits,
+    but results can take up to 24h). Blocks until the batch finishes.
+    Returns a list with one (response_text, error_message) tuple per prompt, in input order.
+    """
+    custom_ids = [f"request-{index}" for index in range(len(prompt_messages_list))] # Must be unique per batch
+    request_options = {"temperature": temperature}
+    if max_tokens is not None:
+        request_options["max_tokens"] = max_tokens
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+        for custom_id, prompt_messages in zip(custom_ids, prompt_messages_list):
+            f.write(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": {"model": model_name, "messages": prompt_messages, **request_options}
+            }) + "\n")
+        input_path = f.name
+
+    try:
+        with open(input_path, 'rb') as f:
+            input_file = client.files.create(file=f, purpose='batch')
+    finally:
+        os.remove(input_path)
+
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW
+    )
+    print(f"Submitted batch {batch.id} with {len(custom_ids)} requests. Waiting for it to finish...")
+    while batch.status not in BATCH_TERMINAL_STATUSES:
+        time.sleep(BATCH_POLL_INTERVAL)
+        batch = client.batches.retrieve(batch.id)
+        print(f"Batch {batch.id} status: {batch.status}")
+
+    results = {custom_id: (None, f"Error: Batch {batch.id} ended with status '{batch.status}'.") for custom_id in custom_ids}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            response = entry.get('response') or {}
+            body = response.get('body') or {}
+            if response.get('status_code') == 200:
+                results[entry['custom_id']] = _extract_content(body)
+            else:
+                error = entry.get('error') or body.get('error')
+                results[entry['custom_id']] = (None, f"Error: Batch request failed: {error}")
+    return [results[custom_id] for custom_id in custom_ids]
@@ -0,0 +1,30 @@
+try:
+    import orjson # Rust-backed encoder, much faster than the stdlib json encoder
+except ImportError:
+    orjson = None
+import json
+import os
+
+# --- Configuration ---
+PROMPT_MAX_ITEMS = int(os.getenv("PROMPT_MAX_ITEMS", "20")) # Max entries per issue category embedded in a prompt
+
+def dumps_for_prompt(obj):
+    """Serializes obj as 2-space indented JSON text for embedding in an LLM prompt."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2)
+
+def dumps_issue_list_for_prompt(items, max_items=None):
+    """
+    Serializes a list of issues for an LLM prompt, keeping only the first max_items entries
+    (PROMPT_MAX_ITEMS by default) so large sites don't blow up the prompt size.
+    """
+    max_items = PROMPT_MAX_ITEMS if max_items is None else max_items
+    shown_items, omitted_count = items[:max_items], max(0, len(items) - max_items)
+    if not omitted_count:
+        return dumps_for_prompt(shown_items)
+    return (
+        f"(showing first {len(shown_items)})\n"
+        f"{dumps_for_prompt(shown_items)}\n"
+        f"... and {omitted_count} more omitted"
+    )
@@ -0,0 +1,19 @@
+# Returned instead of calling the LLM when a report has nothing to analyze
+HEALTHY_REPORT_ANALYSIS = (
+    "## Overall Summary\n"
+    "No issues found — the page appears to be in good health based on these checks "
+    "(no broken internal links, no images with missing alt text, exactly one H1 tag and no severe console errors)."
+)
+
+def count_report_issues(health_data):
+    """Counts the issues in a parsed health report. A failed fetch or non-OK H1 status counts as one issue each."""
+    issue_count = (
+        len(health_data.get('broken_links', []))
+        + len(health_data.get('images_missing_alt', []))
+        + len(health_data.get('console_errors', []))
+    )
+    if health_data.get('fetch_status', 'OK') != 'OK':
+        issue_count += 1
+    if health_data.get('h1_status', {}).get('status') != 'OK':
+        issue_count += 1
+    return issue_count
@@ -0,0 +1,58 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+# --- Configuration ---
+CACHE_DIR = ".ai_cache" # Directory for on-disk cached AI responses
+MEMORY_CACHE_MAXSIZE = 256 # Most recently used responses kept in memory
+VOLATILE_REPORT_FIELDS = {'timestamp'} # Change on every run without changing the findings
+
+_memory_cache = OrderedDict() # key -> response text, in least to most recently used order
+
+def _strip_volatile_fields(value):
+    if isinstance(value, dict):
+        return {key: _strip_volatile_fields(item) for key, item in value.items() if key not in VOLATILE_REPORT_FIELDS}
+    if isinstance(value, list):
+        return [_strip_volatile_fields(item) for item in value]
+    return value
+
+def make_cache_key(health_data, model_name, prompt_version):
+    """
+    Builds a stable cache key from the normalized report, model and prompt version.
+    Volatile fields such as console error timestamps are left out, so rerunning the
+    checker on an unchanged page hits the cache.
+    """
+    normalized_report = json.dumps(_strip_volatile_fields(health_data), sort_keys=True)
+    return hashlib.sha256(f"{normalized_report}|{model_name}|{prompt_version}".encode()).hexdigest()
+
+def get_cached_response(key):
+    """Returns the cached response for the key (memory first, then disk), or None on a miss."""
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        return _memory_cache[key]
+    cache_path = os.path.join(CACHE_DIR, f"{key}.json")
+    try:
+        with open(cache_path, 'r') as f:
+            response_text = json.load(f)['response']
+    except (OSError, ValueError, KeyError):
+        return None
+    _remember(key, response_text)
+    return response_text
+
+def _remember(key, response_text):
+    """Adds the response to the in-memory cache, evicting the least recently used beyond the max size."""
+    _memory_cache[key] = response_text
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > MEMORY_CACHE_MAXSIZE:
+        _memory_cache.popitem(last=False)
+
+def store_response(key, response_text):
+    """Stores a successful response in memory and as a JSON sidecar file on disk."""
+    _remember(key, response_text)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(os.path.join(CACHE_DIR, f"{key}.json"), 'w') as f:
+            json.dump({'response': response_text}, f)
+    except OSError as e:
+        print(f"Warning: Could not write AI response cache: {e}")
@@ -0,0 +1,26 @@
+import random
+
+import openai
+
+# --- Configuration ---
+MAX_RETRY_DELAY = 60 # seconds, upper bound for a single backoff
+RATE_LIMIT_BACKOFF_MULTIPLIER = 2 # Back off harder when the API reports rate limiting
+
+def compute_retry_delay(attempt, base_delay, error=None):
+    """
+    Returns how long to wait before the next attempt (attempt is 0-based).
+    Honors a Retry-After header from the API error if present, otherwise uses
+    exponential backoff with jitter.
+    """
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get('retry-after', 0))
+        except (TypeError, ValueError):
+            retry_after = 0
+        if retry_after > 0:
+            return min(MAX_RETRY_DELAY, retry_after)
+
+    if isinstance(error, openai.RateLimitError) or getattr(response, 'status_code', None) == 429:
+        base_delay *= RATE_LIMIT_BACKOFF_MULTIPLIER
+    return min(MAX_RETRY_DELAY, base_delay * (2 ** attempt)) + random.uniform(0, 1)
@@ -1,27 +1,44 @@
-import json, time, os
+import asyncio, atexit, importlib.util, json, threading, time, os
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
 
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from webdriver_manager.chrome import ChromeDriverManager
-
-#from ai_health_analyzer import analyze_health_report_with_ai
-from langchain_prioritizer import analyze_with_langchain_cot
+# Playwright/Selenium and the AI analyzers are heavy to import, so they are imported where they are used
 
 
 # --- Configuration ---
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36 PortfolioHealthChecker/1.0"
 REQUEST_TIMEOUT = 10 # seconds for HTTP requests
+LINK_CHECK_CONCURRENCY = 20 # max number of link checks in flight at once
+SKIPPED_HREF_PREFIXES = ('#', 'mailto:', 'tel:') # in-page anchors and non-HTTP links are not checked
+PAGE_LOAD_TIMEOUT = 30 # seconds to wait for a page to settle when checking console errors
+RESOURCE_SETTLE_TIMEOUT = 5 # seconds to wait for late XHR/resource loads after the document is ready
+
+# Prefer Playwright (talks to Chrome over CDP directly) for console checks, fall back to Selenium
+USE_PLAYWRIGHT = importlib.util.find_spec('playwright') is not None
+
+try:
+    import lxml # noqa: F401 -- C-backed parser, much faster than the pure Python one
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Shared session so repeated requests to the same host reuse pooled keep-alive connections
+SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=Retry(total=2, backoff_factor=0.3))
+SESSION.mount('https://', _adapter)
+SESSION.mount('http://', _adapter)
+SESSION.headers.update({'User-Agent': USER_AGENT})
 
 # --- Helper Functions ---
 def get_page_content(url):
     """Fetches HTML content of a page and the final URL after redirects."""
-    headers = {'User-Agent': USER_AGENT}
     try:
-        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+        response = SESSION.get(url, timeout=REQUEST_TIMEOUT, allow_redirects=True)
         response.raise_for_status() # Raises an HTTPError for bad responses (4XX or 5XX)
         # Use response.url to get the final URL after any redirects
         return response.text, response.url
@@ -35,61 +52,86 @@ def is_internal_link(link_url, base_domain):
 
 # --- Checker Functions ---
 
-def check_broken_links(soup, page_url):
+async def _check_one(session, semaphore, link_url, link_text):
+    """Checks a single link. Returns a broken link entry, or None if the link is OK."""
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    async with semaphore:
+        try:
+            # Use HEAD request to be faster and save bandwidth, fallback to GET if HEAD fails
+            # Some servers might not correctly implement HEAD
+            async with session.head(link_url, allow_redirects=True, timeout=timeout) as response:
+                status_code = response.status
+            if status_code >= 400:
+                # If HEAD fails, try GET as a fallback for a more robust check
+                print(f"HEAD request for {link_url} failed with {status_code}. Trying GET...")
+                async with session.get(link_url, allow_redirects=True, timeout=timeout) as response_get:
+                    if response_get.status >= 400:
+                        return {'url': link_url, 'status_code': response_get.status, 'text': link_text}
+        except asyncio.TimeoutError:
+            return {'url': link_url, 'status_code': 'Timeout', 'text': link_text}
+        except aiohttp.ClientError as e:
+            return {'url': link_url, 'status_code': str(e), 'text': link_text}
+    return None
+
+async def _check_links_concurrently(text_by_url):
+    """Checks all links concurrently, returning the broken ones in their original order."""
+    semaphore = asyncio.Semaphore(LINK_CHECK_CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit=LINK_CHECK_CONCURRENCY)
+    async with aiohttp.ClientSession(headers={'User-Agent': USER_AGENT}, connector=connector) as session:
+        results = await asyncio.gather(
+            *[_check_one(session, semaphore, url, text) for url, text in text_by_url.items()]
+        )
+    return [result for result in results if result]
+
+def check_broken_links(anchors, page_url):
     """
-    Finds all links on the page and checks their status codes.
+    Checks the status codes of the given <a> tags' links.
     Only checks internal links by default to keep scope manageable.
     """
-    broken_links = []
-    internal_links_to_check = set() # Use a set to avoid duplicate checks
+    # Internal link url -> text of the first anchor pointing to it. The text is extracted once here so
+    # reporting a broken link is a lookup, and keying by url also avoids duplicate checks.
+    text_by_url = {}
     base_domain = urlparse(page_url).netloc
 
-    for anchor_tag in soup.find_all('a', href=True):
-        href = anchor_tag['href']
-        if not href or href.startswith('#') or href.startswith('mailto:') or href.startswith('tel:'):
+    for anchor_tag in anchors:
+        href = anchor_tag.get('href')
+        if not href or href.startswith(SKIPPED_HREF_PREFIXES):
             continue
 
         absolute_url = urljoin(page_url, href) # Resolve relative URLs
 
-        if is_internal_link(absolute_url, base_domain):
-            internal_links_to_check.add(absolute_url)
+        if is_internal_link(absolute_url, base_domain) and absolute_url not in text_by_url:
+            text_by_url[absolute_url] = anchor_tag.get_text(strip=True)
 
-    print(f"Found {len(internal_links_to_check)} unique internal links to check.")
-    for link_url in internal_links_to_check:
-        try:
-            # Use HEAD request to be faster and save bandwidth, fallback to GET if HEAD fails
-            # Some servers might not correctly implement HEAD
-            headers = {'User-Agent': USER_AGENT}
-            response = requests.head(link_url, headers=headers, timeout=REQUEST_TIMEOUT, allow_redirects=True)
-            if response.status_code >= 400:
-                # If HEAD fails, try GET as a fallback for a more robust check
-                print(f"HEAD request for {link_url} failed with {response.status_code}. Trying GET...")
-                response_get = requests.get(link_url, headers=headers, timeout=REQUEST_TIMEOUT, allow_redirects=True)
-                if response_get.status_code >= 400:
-                    broken_links.append({'url': link_url, 'status_code': response_get.status_code, 'text': anchor_tag.get_text(strip=True)})
-            # Optional: Add a small delay to be polite to servers
-            # time.sleep(0.1)
-        except requests.exceptions.Timeout:
-            broken_links.append({'url': link_url, 'status_code': 'Timeout', 'text': anchor_tag.get_text(strip=True)})
-        except requests.exceptions.RequestException as e:
-            broken_links.append({'url': link_url, 'status_code': str(e), 'text': anchor_tag.get_text(strip=True)})
-    return broken_links
-
-def check_alt_texts(soup):
-    """Checks for images missing alt text or with empty alt text."""
+    print(f"Found {len(text_by_url)} unique internal links to check.")
+    if not text_by_url:
+        return []
+    return asyncio.run(_check_links_concurrently(text_by_url))
+
+def check_alt_texts(imgs):
+    """Checks the given <img> tags for missing alt text or empty alt text."""
     images_missing_alt = []
-    for img_tag in soup.find_all('img'):
-        alt_text = img_tag.get('alt')
+    # Report each image source once, e.g. a logo repeated in header and footer.
+    # Images without a src (e.g. lazy-loaded via data-src) can't be told apart, so each is reported.
+    reported_srcs = set()
+    for img_tag in imgs:
+        has_src = bool(img_tag.get('src'))
         src = img_tag.get('src', 'N/A')
+        if has_src and src in reported_srcs:
+            continue
+        alt_text = img_tag.get('alt')
         if alt_text is None:
             images_missing_alt.append({'src': src, 'issue': 'Missing alt attribute'})
         elif not alt_text.strip():
             images_missing_alt.append({'src': src, 'issue': 'Empty alt attribute'})
+        else:
+            continue
+        if has_src:
+            reported_srcs.add(src)
     return images_missing_alt
 
-def check_h1_tags(soup):
-    """Checks for the number of H1 tags."""
-    h1_tags = soup.find_all('h1')
+def check_h1_tags(h1_tags):
+    """Checks the number of H1 tags."""
     count = len(h1_tags)
     texts = [h1.get_text(strip=True) for h1 in h1_tags]
     if count == 1:
@@ -99,26 +141,116 @@ def check_h1_tags(soup):
     else:
         return {'status': 'Multiple H1s', 'count': count, 'texts': texts}
 
-def check_console_errors(page_url):
-    """Uses Selenium to load the page and check for JavaScript console errors."""
-    console_errors = []
-    chrome_options = ChromeOptions()
-    chrome_options.add_argument("--headless")  # Run in headless mode
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--log-level=3") # Suppress non-critical logs from ChromeDriver
-    # Enable logging preferences for browser console
-    chrome_options.set_capability('goog:loggingPrefs', {'browser': 'SEVERE'})
+_DRIVER = None # Shared headless Chrome, created on first use and reused across checks
+DRIVER_PATH_CACHE = os.path.expanduser("~/.cache/wdm_path.txt") # Resolved ChromeDriver path from a previous run
+
+def _get_chromedriver_path(driver_manager_class, use_cache=True):
+    """
+    Returns (path, from_cache): the ChromeDriver path cached by a previous run, if that file still
+    exists. Otherwise installs it via webdriver_manager (which checks the latest version over the
+    network) and caches the resolved path for next time.
+    """
+    if use_cache:
+        try:
+            with open(DRIVER_PATH_CACHE, 'r') as f:
+                cached_path = f.read().strip()
+            if cached_path and os.path.exists(cached_path):
+                return cached_path, True
+        except OSError:
+            pass
+
+    os.environ.setdefault("WDM_LOG", "0") # Silence webdriver_manager's own logging
+    driver_path = driver_manager_class().install()
+    try:
+        os.makedirs(os.path.dirname(DRIVER_PATH_CACHE), exist_ok=True)
+        with open(DRIVER_PATH_CACHE, 'w') as f:
+            f.write(driver_path)
+    except OSError as e:
+        print(f"Warning: Could not cache ChromeDriver path: {e}")
+    return driver_path, False
+
+def _get_driver():
+    """Returns the shared WebDriver, starting Chrome on the first call."""
+    global _DRIVER
+    if _DRIVER is None:
+        from selenium import webdriver
+        from selenium.common.exceptions import WebDriverException
+        from selenium.webdriver.chrome.service import Service as ChromeService
+        from selenium.webdriver.chrome.options import Options as ChromeOptions
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        chrome_options = ChromeOptions()
+        chrome_options.add_argument("--headless")  # Run in headless mode
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--log-level=3") # Suppress non-critical logs from ChromeDriver
+        # Enable logging preferences for browser console
+        chrome_options.set_capability('goog:loggingPrefs', {'browser': 'SEVERE'})
+
+        print("Initializing WebDriver...")
+        driver_path, from_cache = _get_chromedriver_path(ChromeDriverManager)
+        try:
+            _DRIVER = webdriver.Chrome(service=ChromeService(driver_path), options=chrome_options)
+        except WebDriverException as e:
+            if not from_cache:
+                raise
+            # The cached driver may no longer match Chrome (e.g. after a Chrome auto-update)
+            print(f"Cached ChromeDriver failed to start ({e.msg}). Reinstalling...")
+            try:
+                os.remove(DRIVER_PATH_CACHE)
+            except OSError:
+                pass
+            driver_path, _ = _get_chromedriver_path(ChromeDriverManager, use_cache=False)
+            _DRIVER = webdriver.Chrome(service=ChromeService(driver_path), options=chrome_options)
+        atexit.register(_quit_driver)
+    return _DRIVER
+
+def _quit_driver():
+    """Shuts down the shared WebDriver, if it is running."""
+    global _DRIVER
+    if _DRIVER is not None:
+        try:
+            _DRIVER.quit()
+        finally:
+            _DRIVER = None
 
+def _wait_for_page_to_settle(driver):
+    """
+    Waits until the document is ready and no new resources have loaded for one poll interval.
+    Gives up quietly on timeout so slow or constantly polling pages are still checked.
+    """
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    try:
+        WebDriverWait(driver, PAGE_LOAD_TIMEOUT).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+    except TimeoutException:
+        print("Page did not finish loading in time, checking console errors so far.")
+        return
+
+    last_resource_count = [-1]
+    def resources_settled(d):
+        resource_count = d.execute_script("return window.performance.getEntriesByType('resource').length")
+        settled = resource_count == last_resource_count[0]
+        last_resource_count[0] = resource_count
+        return settled
 
-    print(f"Initializing WebDriver for {page_url}...")
-    driver = None # Initialize driver to None
     try:
-        service = ChromeService(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
+        WebDriverWait(driver, RESOURCE_SETTLE_TIMEOUT, poll_frequency=0.5).until(resources_settled)
+    except TimeoutException:
+        pass # Page keeps loading resources (e.g. polling), check what has been logged so far
+
+def _check_console_errors_selenium(page_url):
+    """Uses Selenium to load the page and check for JavaScript console errors."""
+    console_errors = []
+    try:
+        driver = _get_driver()
+        driver.get_log('browser') # Discard any entries left over from a previous page
         driver.get(page_url)
-        # Wait a bit for dynamic content to load and potentially trigger errors
-        time.sleep(3) # Adjust as needed
+        # Wait for dynamic content to load and potentially trigger errors
+        _wait_for_page_to_settle(driver)
 
         logs = driver.get_log('browser')
         for entry in logs:
@@ -133,11 +265,138 @@ def check_console_errors(page_url):
     except Exception as e:
         print(f"Selenium error checking console for {page_url}: {e}")
         console_errors.append({'level': 'DRIVER_ERROR', 'message': str(e)})
+        _quit_driver() # Start from a fresh browser on the next check
+    return console_errors
+
+_PLAYWRIGHT_LOOP = None # Background event loop that owns the Playwright browser
+_PLAYWRIGHT = None
+_BROWSER = None
+_PLAYWRIGHT_LOCK = threading.Lock()
+
+def _get_playwright_loop():
+    """
+    Returns the background event loop used for Playwright, starting it on the first call.
+    Playwright objects are bound to the loop they were created on, so all browser work is
+    submitted to this one loop, which lets the browser be reused from any thread.
+    """
+    global _PLAYWRIGHT_LOOP
+    with _PLAYWRIGHT_LOCK:
+        if _PLAYWRIGHT_LOOP is None:
+            _PLAYWRIGHT_LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_PLAYWRIGHT_LOOP.run_forever, daemon=True).start()
+            atexit.register(_close_playwright)
+    return _PLAYWRIGHT_LOOP
+
+async def _get_browser():
+    """Returns the shared headless Chromium, launching it on the first call or if it has crashed/disconnected."""
+    global _PLAYWRIGHT, _BROWSER
+    if _BROWSER is not None and not _BROWSER.is_connected():
+        print("Headless Chromium disconnected, relaunching...")
+        await _shutdown_browser()
+    if _BROWSER is None:
+        from playwright.async_api import async_playwright
+        print("Launching headless Chromium...")
+        _PLAYWRIGHT = await async_playwright().start()
+        _BROWSER = await _PLAYWRIGHT.chromium.launch(headless=True)
+    return _BROWSER
+
+async def _shutdown_browser():
+    global _PLAYWRIGHT, _BROWSER
+    if _BROWSER is not None:
+        try:
+            await _BROWSER.close()
+        except Exception as e: # A crashed browser may fail to close cleanly
+            print(f"Error closing Playwright browser: {e}")
+        _BROWSER = None
+    if _PLAYWRIGHT is not None:
+        try:
+            await _PLAYWRIGHT.stop()
+        finally:
+            _PLAYWRIGHT = None
+
+def _close_playwright():
+    """Closes the shared browser and stops the background event loop."""
+    try:
+        asyncio.run_coroutine_threadsafe(_shutdown_browser(), _PLAYWRIGHT_LOOP).result(timeout=10)
+    except Exception as e:
+        print(f"Error closing Playwright browser: {e}")
+    _PLAYWRIGHT_LOOP.call_soon_threadsafe(_PLAYWRIGHT_LOOP.stop)
+
+async def _collect_console_errors_playwright(page_url):
+    """Loads the page in a fresh browser context and collects console errors and uncaught exceptions."""
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    browser = await _get_browser()
+    context = await browser.new_context(user_agent=USER_AGENT)
+    console_errors = []
+
+    def on_console(msg):
+        if msg.type == 'error':
+            location = msg.location
+            console_errors.append({
+                'level': 'SEVERE', # Same level name as the Selenium browser log
+                'message': msg.text,
+                'source': f"{location.get('url', 'N/A')}:{location.get('lineNumber', 0)}:{location.get('columnNumber', 0)}",
+                'timestamp': int(time.time() * 1000)
+            })
+
+    def on_page_error(error):
+        console_errors.append({
+            'level': 'SEVERE',
+            'message': f"Uncaught {error}",
+            'source': page_url,
+            'timestamp': int(time.time() * 1000)
+        })
+
+    try:
+        page = await context.new_page()
+        page.on('console', on_console)
+        page.on('pageerror', on_page_error)
+        try:
+            await page.goto(page_url, wait_until='load', timeout=PAGE_LOAD_TIMEOUT * 1000)
+            # Give late XHR/resource loads a bounded chance to finish and log errors
+            await page.wait_for_load_state('networkidle', timeout=RESOURCE_SETTLE_TIMEOUT * 1000)
+        except PlaywrightTimeoutError:
+            # Slow or constantly polling pages are still checked, like the Selenium path does
+            print(f"Page {page_url} did not settle in time, checking console errors so far.")
     finally:
-        if driver:
-            driver.quit()
+        await context.close()
     return console_errors
 
+def _start_playwright_browser():
+    """Launches the shared Playwright browser. Returns False if it cannot be started."""
+    loop = _get_playwright_loop()
+    try:
+        asyncio.run_coroutine_threadsafe(_get_browser(), loop).result()
+        return True
+    except Exception as e:
+        # E.g. the browser was never downloaded with "playwright install"
+        print(f"Could not launch Playwright Chromium: {e}")
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown_browser(), loop).result(timeout=10)
+        except Exception:
+            pass
+        return False
+
+def _check_console_errors_playwright(page_url):
+    """Uses Playwright to load the page and check for JavaScript console errors."""
+    try:
+        future = asyncio.run_coroutine_threadsafe(_collect_console_errors_playwright(page_url), _get_playwright_loop())
+        return future.result()
+    except Exception as e:
+        print(f"Playwright error checking console for {page_url}: {e}")
+        return [{'level': 'DRIVER_ERROR', 'message': str(e)}]
+
+def check_console_errors(page_url):
+    """Loads the page in headless Chrome and returns its SEVERE JavaScript console errors."""
+    global USE_PLAYWRIGHT
+    if USE_PLAYWRIGHT and not _start_playwright_browser():
+        print("Falling back to Selenium for console error checks.")
+        USE_PLAYWRIGHT = False
+    if USE_PLAYWRIGHT:
+        return _check_console_errors_playwright(page_url)
+    return _check_console_errors_selenium(page_url)
+
 # --- Main Orchestrator ---
 def run_website_health_checks(start_url):
     """Runs all health checks for the given URL."""
@@ -160,23 +419,30 @@ def run_website_health_checks(start_url):
         print(f"Aborting checks for {start_url} due to fetch failure.")
         return results
 
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = BeautifulSoup(html_content, HTML_PARSER)
+    # Collect all tags the checkers need in a single traversal of the parse tree
+    tags_by_name = {'a': [], 'img': [], 'h1': []}
+    for tag in soup.find_all(['a', 'img', 'h1']):
+        tags_by_name[tag.name].append(tag)
 
-    print("\n--- Checking Broken Links (Internal) ---")
-    results['broken_links'] = check_broken_links(soup, final_url)
-    print(f"Found {len(results['broken_links'])} broken internal links.")
+    # Broken links and console errors are both network bound and independent, so run them
+    # in the background while the parse-tree checks run on this thread.
+    # Console errors are only checked if the initial page load was successful.
+    print("\n--- Checking Broken Links (Internal) and Console Errors (via headless Chrome) ---")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        broken_links_future = executor.submit(check_broken_links, tags_by_name['a'], final_url)
+        console_errors_future = executor.submit(check_console_errors, final_url)
 
-    print("\n--- Checking Image Alt Texts ---")
-    results['images_missing_alt'] = check_alt_texts(soup)
-    print(f"Found {len(results['images_missing_alt'])} images with alt text issues.")
+        results['images_missing_alt'] = check_alt_texts(tags_by_name['img'])
+        results['h1_status'] = check_h1_tags(tags_by_name['h1'])
 
-    print("\n--- Checking H1 Tags ---")
-    results['h1_status'] = check_h1_tags(soup)
-    print(f"H1 Tag Status: {results['h1_status']['status']} (Count: {results['h1_status']['count']})")
+        results['broken_links'] = broken_links_future.result()
+        results['console_errors'] = console_errors_future.result()
 
-    print("\n--- Checking Console Errors (via Selenium) ---")
-    # Only run Selenium if the initial page load was successful
-    results['console_errors'] = check_console_errors(final_url)
+    print("\n--- Results ---")
+    print(f"Found {len(results['broken_links'])} broken internal links.")
+    print(f"Found {len(results['images_missing_alt'])} images with alt text issues.")
+    print(f"H1 Tag Status: {results['h1_status']['status']} (Count: {results['h1_status']['count']})")
     print(f"Found {len(results['console_errors'])} SEVERE console errors.")
 
     print("\n--- Health Check Complete ---")
@@ -207,6 +473,8 @@ if __name__ == "__main__":
         # --- Call the AI Analyzer ---
         print("\n\n--- Langchain CoT Analysis & Prioritization ---")
         if os.getenv("OPENAI_API_KEY"): # Only proceed if API key is available
+            #from ai_health_analyzer import analyze_health_report_with_ai
+            from langchain_prioritizer import analyze_with_langchain_cot
             ai_summary = analyze_with_langchain_cot(health_report_json_str)
             print(ai_summary)
             